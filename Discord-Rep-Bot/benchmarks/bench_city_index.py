@@ -0,0 +1,76 @@
+"""
+Accuracy and latency of CityIndex versus the old compile_city_patterns/has_city regex check.
+
+Run from the Discord-Rep-Bot folder:
+    python benchmarks/bench_city_index.py
+"""
+import os
+import re
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from city_index import CityIndex  # noqa: E402
+
+# --- Old implementation (removed from forum_checker.py) ---
+
+def compile_city_patterns(cities):
+    return [re.compile(rf"\b{re.escape(city.lower())}\b") for city in cities]
+
+def has_city(text, city_patterns):
+    lowered = text.lower()
+    return any(pattern.search(lowered) for pattern in city_patterns)
+
+# --- Data ---
+
+def load_lines(filename):
+    with open(os.path.join(HERE, filename), "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip() and not line.startswith("#")]
+
+def load_titles():
+    titles = []
+    for line in load_lines("city_titles.txt"):
+        label, _, title = line.partition("\t")
+        titles.append((label == "1", title))
+    return titles
+
+def score(check, titles):
+    true_pos = sum(1 for label, title in titles if label and check(title))
+    false_pos = sum(1 for label, title in titles if not label and check(title))
+    return true_pos, false_pos
+
+def per_title_us(check, titles, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for _, title in titles:
+            check(title)
+    return (time.perf_counter() - start) / (rounds * len(titles)) * 1e6
+
+def main(rounds=200):
+    lines = load_lines("ca_cities.txt")
+    # the old code had no alias syntax, so it only saw the names
+    names = [line.partition("=")[0].strip() for line in lines]
+    titles = load_titles()
+    positives = sum(1 for label, _ in titles if label)
+    negatives = len(titles) - positives
+
+    patterns = compile_city_patterns(names)
+    checks = [
+        ("regex (recompiled per message)", lambda t: has_city(t, compile_city_patterns(names))),
+        ("regex (precompiled)", lambda t: has_city(t, patterns)),
+    ]
+    for distance in (0, 1, 2):
+        index = CityIndex(lines, max_distance=distance)
+        checks.append((f"CityIndex max_distance={distance}", lambda t, index=index: index.find(t) is not None))
+
+    print(f"{len(names)} cities, {positives} titles with a city, {negatives} without")
+    print(f"{'method':<34} {'recall':>8} {'false pos':>10} {'us/title':>10}")
+    for name, check in checks:
+        true_pos, false_pos = score(check, titles)
+        latency = per_title_us(check, titles, rounds)
+        print(f"{name:<34} {true_pos:>3}/{positives:<4} {false_pos:>4}/{negatives:<5} {latency:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import re
+
+# Tokens are runs of letters/digits, so "St. Helena" and "st helena" normalize the same way.
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+    """
+    Lowercases text and splits it into word tokens.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+def levenshtein(a, b, limit=None):
+    """
+    Returns the edit distance between a and b.
+    If limit is given, stops early and returns limit + 1 once the distance is known to exceed it.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+# --- Trigram index for fuzzy lookups ---
+
+def trigrams(word):
+    """
+    Returns the padded trigrams of word, e.g. "napa" -> {"$$n", "$na", "nap", "apa", "pa$"}.
+    """
+    padded = f"$${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class TrigramIndex:
+    """
+    Maps trigrams to the words containing them.
+    A single edit changes at most 3 trigrams, so a word within max_distance of the query
+    must share at least len(trigrams(query)) - 3 * max_distance of them. Only those
+    candidates get the (expensive) edit distance check. If the query is too short for
+    that bound to filter anything, every stored word is checked instead.
+    """
+    def __init__(self):
+        self.words = []
+        self.postings = {}  # trigram -> list of word ids
+        self.lengths = set()
+
+    def add(self, word):
+        word_id = len(self.words)
+        self.words.append(word)
+        self.lengths.add(len(word))
+        for gram in trigrams(word):
+            self.postings.setdefault(gram, []).append(word_id)
+
+    def search(self, word, max_distance, same_first_letter=False):
+        """
+        Returns the closest stored word within max_distance as (distance, word), or None.
+        With same_first_letter, only words starting with the same character are considered.
+        """
+        if not any(abs(length - len(word)) <= max_distance for length in self.lengths):
+            return None
+        grams = trigrams(word)
+        needed = len(grams) - 3 * max_distance
+        if needed <= 0:
+            candidates = range(len(self.words))
+        else:
+            counts = {}
+            for gram in grams:
+                for word_id in self.postings.get(gram, ()):
+                    counts[word_id] = counts.get(word_id, 0) + 1
+            candidates = [word_id for word_id, shared in counts.items() if shared >= needed]
+        best = None
+        for word_id in candidates:
+            candidate = self.words[word_id]
+            if abs(len(candidate) - len(word)) > max_distance:
+                continue
+            if same_first_letter and candidate[0] != word[0]:
+                continue
+            distance = levenshtein(word, candidate, limit=max_distance)
+            if distance <= max_distance and (best is None or distance < best[0]):
+                best = (distance, candidate)
+        return best
+
+# --- City Index ---
+
+# Extra characters a phrase needs for each edit beyond the first
+FUZZY_LENGTH_STEP = 3
+
+# Below this, the trigram filter can't rule anything out and every lookup would scan all names
+MIN_FUZZY_LENGTH_FLOOR = 3
+
+class CityIndex:
+    """
+    Location index built once from cities.txt.
+
+    Each line is a city name, optionally followed by aliases:
+        San Francisco = SF, San Fran, Frisco
+    Lookups try exact name/alias matches first, then fall back to a trigram
+    fuzzy match. Short words are too easily confused with city names ("track" vs
+    "Tracy"), so a phrase needs min_fuzzy_length characters for 1 edit, plus
+    FUZZY_LENGTH_STEP more for each further edit, up to max_distance. Fuzzy matches
+    must also start with the same letter as the city name.
+    min_fuzzy_length is raised to MIN_FUZZY_LENGTH_FLOOR so lookups stay sublinear.
+    """
+    def __init__(self, lines, max_distance=1, min_fuzzy_length=7):
+        self.max_distance = max_distance
+        self.min_fuzzy_length = max(min_fuzzy_length, MIN_FUZZY_LENGTH_FLOOR)
+        self.phrases = {}  # normalized phrase -> canonical city name
+        self.fuzzy = {}  # word count -> TrigramIndex of city names (aliases are exact-only)
+        self.max_words = 0
+
+        for line in lines:
+            name, _, alias_text = line.partition("=")
+            name = name.strip()
+            if not name:
+                continue
+            self._add_phrase(name, name, fuzzy=True)
+            for alias in alias_text.split(","):
+                if alias.strip():
+                    self._add_phrase(alias, name, fuzzy=False)
+
+    def _add_phrase(self, phrase, city, fuzzy):
+        tokens = tokenize(phrase)
+        if not tokens:
+            return
+        key = " ".join(tokens)
+        self.phrases.setdefault(key, city)
+        self.max_words = max(self.max_words, len(tokens))
+        if fuzzy:
+            self.fuzzy.setdefault(len(tokens), TrigramIndex()).add(key)
+
+    def find(self, text):
+        """
+        Returns the canonical name of the first city found in text, or None.
+        Exact name/alias matches anywhere in the text win over fuzzy matches.
+        """
+        tokens = tokenize(text)
+        for key, _ in self._phrases_in(tokens):
+            city = self.phrases.get(key)
+            if city:
+                return city
+        for key, size in self._phrases_in(tokens):
+            city = self._fuzzy_lookup(key, size)
+            if city:
+                return city
+        return None
+
+    def _phrases_in(self, tokens):
+        """
+        Yields (phrase, word count) for every run of up to max_words tokens, longest first at each position.
+        """
+        for start in range(len(tokens)):
+            for size in range(min(self.max_words, len(tokens) - start), 0, -1):
+                yield " ".join(tokens[start:start + size]), size
+
+    def allowed_distance(self, key):
+        """
+        Returns how many edits a phrase of this length may have and still match.
+        """
+        if len(key) < self.min_fuzzy_length:
+            return 0
+        return min(self.max_distance, (len(key) - self.min_fuzzy_length) // FUZZY_LENGTH_STEP + 1)
+
+    def _fuzzy_lookup(self, key, size):
+        distance = self.allowed_distance(key)
+        if distance <= 0 or key.isdigit():
+            return None
+        index = self.fuzzy.get(size)
+        if index is None:
+            return None
+        match = index.search(key, distance, same_first_letter=True)
+        if match:
+            return self.phrases[match[1]]
+        return None
+
+    def __contains__(self, text):
+        return self.find(text) is not None
+
+    def __len__(self):
+        return len(self.phrases)
@@ -0,0 +1,179 @@
+import asyncio
+import csv
+import gzip
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from urllib.request import pathname2url
+
+# tables written by export_database, in order
+EXPORT_TABLES = ["rep_totals", "rep_stats", "rep_buckets"]
+
+# Only one snapshot (scheduled or /snapshot) runs at a time
+_snapshot_lock = asyncio.Lock()
+
+class _BackupBudgetExceeded(Exception):
+    pass
+
+# --- Online Snapshot ---
+
+def snapshot_database(db_path, backup_dir, pages=64, sleep=0.005, budget=5.0):
+    """
+    Copies db_path into backup_dir using SQLite's online backup API.
+    Copies `pages` pages per step and releases the read lock in between (backing off for `sleep`
+    seconds if the database is busy), so writers (add_rep) are never locked out for long.
+
+    A write from another connection between steps makes SQLite restart the copy from page 0,
+    so under steady writes the incremental copy can take seconds or never finish. After
+    `budget` seconds it gives up and copies the rest in one step instead, which holds the
+    read lock for the whole copy (writers wait, up to their busy timeout) but always finishes.
+
+    Writes to a .tmp file and renames it, so a finished snapshot is never torn.
+    The source is opened read-only, so a wrong db_path raises instead of backing up a new empty database.
+    Returns a dict with the snapshot path, duration, restart count and whether the one-step fallback ran.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(db_path))[0]
+    snapshot_path = os.path.join(backup_dir, f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.db")
+    if os.path.exists(snapshot_path):
+        raise FileExistsError(f"Snapshot {snapshot_path} already exists")
+    tmp_path = snapshot_path + ".tmp"
+
+    start = time.perf_counter()
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+        last_remaining = remaining
+        if time.perf_counter() - start > budget:
+            raise _BackupBudgetExceeded()
+
+    single_step = False
+    src = sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro", uri=True)
+    try:
+        dst = sqlite3.connect(tmp_path)
+        try:
+            try:
+                src.backup(dst, pages=pages, progress=progress, sleep=sleep)
+            except _BackupBudgetExceeded:
+                single_step = True
+                src.backup(dst, pages=-1)
+        finally:
+            dst.close()
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        src.close()
+    os.rename(tmp_path, snapshot_path)
+    return {
+        "path": snapshot_path,
+        "duration": time.perf_counter() - start,
+        "restarts": restarts,
+        "single_step": single_step,
+    }
+
+def prune_snapshots(backup_dir, keep):
+    """
+    Deletes all but the newest `keep` snapshots in backup_dir, along with their exports.
+    """
+    filenames = os.listdir(backup_dir)
+    snapshots = sorted((f for f in filenames if f.endswith(".db")), reverse=True)
+    for snapshot in snapshots[keep:]:
+        stem = os.path.splitext(snapshot)[0]
+        for filename in filenames:
+            if filename == snapshot or filename.startswith(stem + ".") or filename.startswith(stem + "-"):
+                try:
+                    os.remove(os.path.join(backup_dir, filename))
+                except OSError as e:
+                    print(f"Backup: could not remove old backup file {filename}: {e}")
+
+# --- Streaming Export ---
+
+def export_database(db_path, fmt="jsonl", compress=True):
+    """
+    Streams every table in EXPORT_TABLES out of db_path, one row at a time.
+    jsonl writes one file with a "table" field on each row. csv writes one file per table.
+    Run this on a snapshot rather than the live database to get a consistent export.
+    Returns the list of files written.
+    """
+    if fmt not in ("jsonl", "csv"):
+        raise ValueError(f"Unsupported export format: {fmt}")
+    base = os.path.splitext(db_path)[0]
+    suffix = ".gz" if compress else ""
+
+    def open_out(path):
+        if compress:
+            return gzip.open(path, "wt", encoding="utf-8", newline="")
+        return open(path, "w", encoding="utf-8", newline="")
+
+    written = []
+    with sqlite3.connect(db_path) as conn:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        tables = [t for t in EXPORT_TABLES if t in existing]
+
+        if fmt == "jsonl":
+            path = f"{base}.jsonl{suffix}"
+            with open_out(path) as out:
+                for table in tables:
+                    cursor = conn.execute(f"SELECT * FROM {table}")
+                    columns = [d[0] for d in cursor.description]
+                    for row in cursor:
+                        record = {"table": table, **dict(zip(columns, row))}
+                        out.write(json.dumps(record) + "\n")
+            written.append(path)
+        else:
+            for table in tables:
+                path = f"{base}-{table}.csv{suffix}"
+                with open_out(path) as out:
+                    cursor = conn.execute(f"SELECT * FROM {table}")
+                    writer = csv.writer(out)
+                    writer.writerow([d[0] for d in cursor.description])
+                    for row in cursor:
+                        writer.writerow(row)
+                written.append(path)
+    return written
+
+# --- Async Wrappers ---
+
+async def measure_loop_lag(stop_event, interval=0.05):
+    """
+    Samples how late the event loop wakes up from a short sleep until stop_event is set.
+    Returns the worst lag seen, in seconds.
+    """
+    worst = 0.0
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+async def run_snapshot(db_path, backup_dir, keep=7, export_format=None, compress=True, budget=5.0):
+    """
+    Takes a snapshot (and optional export) in a worker thread so the event loop keeps running.
+    Overlapping calls wait for the running snapshot to finish first.
+    Returns snapshot_database's dict plus the exported files and the worst event loop lag.
+    """
+    def work():
+        result = snapshot_database(db_path, backup_dir, budget=budget)
+        result["exported"] = export_database(result["path"], export_format, compress) if export_format else []
+        prune_snapshots(backup_dir, keep)
+        return result
+
+    async with _snapshot_lock:
+        stop_event = asyncio.Event()
+        lag_task = asyncio.create_task(measure_loop_lag(stop_event))
+        try:
+            result = await asyncio.to_thread(work)
+        finally:
+            stop_event.set()
+            max_lag = await lag_task
+
+    result["max_loop_lag"] = max_lag
+    return result
@@ -4,12 +4,6 @@ import time
 
 # --- Utility Functions ---
 
-def compile_city_patterns(cities):
-    """
-    Compile regex patterns for each city for efficient matching.
-    """
-    return [re.compile(rf"\b{re.escape(city.lower())}\b") for city in cities]
-
 def has_price(text):
     """
     Returns True if the text contains a price pattern like $300, 300$, or keywords indicating free.
@@ -23,12 +17,11 @@ def has_price(text):
         return True
     return False
 
-def has_city(text, city_patterns):
+def has_city(text, city_index):
     """
-    Returns True if the text contains a whole word match for any city.
+    Returns True if the text mentions any city, alias, or close misspelling in the CityIndex.
     """
-    lowered = text.lower()
-    return any(pattern.search(lowered) for pattern in city_patterns)
+    return city_index.find(text) is not None
 
 # --- Notification Tracking with Cleanup ---
 
@@ -100,7 +93,7 @@ async def handle_thread_message(
     forum_channel_id,
     missing_price_tag_name,
     missing_location_tag_name,
-    cities,
+    city_index,
     notified_threads_obj
 ):
     """
@@ -110,8 +103,6 @@ async def handle_thread_message(
     - Only sends a new notification if the OP replies to the bot's last notification.
     - If the thread is older than 1 day, do not re-flag or re-notify.
     """
-    city_patterns = compile_city_patterns(cities)
-
     # --- OP's first message in the thread ---
     if (
         isinstance(message.channel, discord.Thread)
@@ -130,8 +121,8 @@ async def handle_thread_message(
         missing_price_tag = discord.utils.get(tags, name=missing_price_tag_name)
         missing_location_tag = discord.utils.get(tags, name=missing_location_tag_name)
 
-    price_found = has_price(message.channel.name) or has_price(message.content)
-    location_found = has_city(message.channel.name, city_patterns) or has_city(message.content, city_patterns)
+        price_found = has_price(message.channel.name) or has_price(message.content)
+        location_found = has_city(message.channel.name, city_index) or has_city(message.content, city_index)
 
         updated_tags = await update_tags(message.channel, price_found, location_found, missing_price_tag, missing_location_tag)
 
@@ -175,12 +166,12 @@ async def handle_thread_message(
 
             starter_message = thread.starter_message
             price_found = has_price(thread.name)
-            location_found = has_norcal_city(thread.name, city_patterns)
+            location_found = has_city(thread.name, city_index)
             if starter_message:
                 price_found = price_found or has_price(starter_message.content)
-                location_found = location_found or has_norcal_city(starter_message.content, city_patterns)
+                location_found = location_found or has_city(starter_message.content, city_index)
             price_found = price_found or has_price(message.content)
-            location_found = location_found or has_city(message.content, city_patterns)
+            location_found = location_found or has_city(message.content, city_index)
 
             updated_tags = await update_tags(thread, price_found, location_found, missing_price_tag, missing_location_tag)
 
@@ -213,15 +204,13 @@ async def handle_thread_create(
     forum_channel_id,
     missing_price_tag_name,
     missing_location_tag_name,
-    cities
+    city_index
 ):
     """
     Handles new forum threads:
     - Checks for price and location in the title.
     - Adds missing tags if info is not found.
     """
-    city_patterns = compile_city_patterns(cities)
-
     if thread.parent_id != forum_channel_id:
         return
 
@@ -232,7 +221,7 @@ async def handle_thread_create(
     missing_location_tag = discord.utils.get(tags, name=missing_location_tag_name)
 
     price_found = has_price(thread.name)
-    location_found = has_city(thread.name, city_patterns)
+    location_found = has_city(thread.name, city_index)
 
     updated_tags = current_tags.copy()
     if not price_found and missing_price_tag and missing_price_tag not in updated_tags:
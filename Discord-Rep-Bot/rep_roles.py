@@ -1,5 +1,6 @@
 import discord
 import re  # Import re module for regular expression operations
+from rep_stats import metric_value
 
 # Change the role IDs below to match your server's roles. The format is (threshold, role_id). So when someone hits 5 rep, they get the Starter role, at 20 they get Positive, and at 100 they get Trusted.
 
@@ -10,10 +11,14 @@ ROLE_THRESHOLDS = [
     (5, 123456),  # Starter role
 ]
 
-async def update_rep_role(member: discord.Member, rep: int):
+# Which number ROLE_THRESHOLDS are compared against: "total" (lifetime rep), "7d", "30d", "90d"
+# (positive minus negative reviews in that many days) or "decay" (time-decayed score).
+ROLE_METRIC = "total"
+
+async def update_rep_role(member: discord.Member, rep: int, stats=None):
     """
     Assigns or removes roles based on the user's reputation.
-    Only the highest qualifying role is assigned.
+    Only the highest qualifying role is assigned, using ROLE_METRIC (stats comes from rep_stats.get_rep_stats).
     Updates the member's nickname to include their rep in the format: Name (25 rep), but only if rep > 0.
     Does NOT change nickname for users with 0 rep.
     """
@@ -27,8 +32,9 @@ async def update_rep_role(member: discord.Member, rep: int):
                 print(f"Error removing role {role.name} from {member.display_name}: {e}")
 
     # Assign the highest role they qualify for
+    score = metric_value(ROLE_METRIC, rep, stats)
     for threshold, role_id in sorted(ROLE_THRESHOLDS, reverse=True):
-        if rep >= threshold:
+        if score >= threshold:
             role = member.guild.get_role(role_id)
             if role and role not in member.roles:
                 try:
@@ -0,0 +1,214 @@
+import time
+
+# Rolling windows in days. Changing these changes the rep_stats columns; ensure_stats_tables
+# rebuilds rep_stats from rep_buckets on the next start (buckets only cover the largest old window).
+WINDOWS = (7, 30, 90)
+
+# Half-life of the decayed score in days: a review counts half as much after this long
+DECAY_HALF_LIFE_DAYS = 30
+
+# The decayed score is stored as decay_sum = sum(±1 * 2 ** ((review_time - DECAY_EPOCH) / half-life)),
+# so rows sort by decay_sum without being touched as time passes. The weights stay well inside
+# float range for about 80 years after the epoch (2024-01-01 UTC).
+DECAY_EPOCH = 1704067200
+
+# Metric names accepted by metric_value (and the leaderboard / ROLE_METRIC)
+METRICS = ["total"] + [f"{w}d" for w in WINDOWS] + ["decay"]
+
+SECONDS_PER_DAY = 86400
+
+def stats_columns():
+    return ["user_id", "day"] + [f"{p}_{w}" for w in WINDOWS for p in ("pos", "neg")] + ["decay_sum"]
+
+def ensure_stats_tables(c, now=None):
+    """
+    Creates the rolling stats tables. review.py calls this once at startup; nothing else does.
+    rep_stats holds the running window totals per user, so reads never sum buckets.
+    rep_buckets holds one row of counts per user per day, kept only for the largest window
+    so the totals can be reduced as days fall out of each window.
+    If rep_stats exists with different columns (older schema or edited WINDOWS), it is rebuilt.
+    """
+    c.execute(
+        'CREATE TABLE IF NOT EXISTS rep_buckets (user_id INTEGER, day INTEGER, '
+        'positive INTEGER DEFAULT 0, negative INTEGER DEFAULT 0, PRIMARY KEY (user_id, day))'
+    )
+    c.execute('PRAGMA table_info(rep_stats)')
+    existing = [row[1] for row in c.fetchall()]
+    if existing and set(existing) != set(stats_columns()):
+        _rebuild_stats(c, existing, time.time() if now is None else now)
+    else:
+        _create_stats_table(c)
+
+def _create_stats_table(c):
+    window_columns = ", ".join(
+        f"pos_{w} INTEGER DEFAULT 0, neg_{w} INTEGER DEFAULT 0" for w in WINDOWS
+    )
+    c.execute(
+        f'CREATE TABLE IF NOT EXISTS rep_stats (user_id INTEGER PRIMARY KEY, day INTEGER, '
+        f'{window_columns}, decay_sum REAL DEFAULT 0)'
+    )
+
+def _rebuild_stats(c, old_columns, now):
+    """
+    Recreates rep_stats with the current columns. Window totals are recounted from rep_buckets.
+    The decayed score is carried over from decay_sum, or converted from the old
+    decay_score/decay_time columns; failing both it is rebuilt from the buckets.
+    """
+    print(f"rep_stats has columns {old_columns}, expected {stats_columns()}; rebuilding it from rep_buckets.")
+    c.execute('SELECT * FROM rep_stats')
+    old_rows = {row[0]: dict(zip(old_columns, row)) for row in c.fetchall()}
+    c.execute('DROP TABLE rep_stats')
+    _create_stats_table(c)
+
+    today = int(now // SECONDS_PER_DAY)
+    c.execute('DELETE FROM rep_buckets WHERE day <= ?', (today - max(WINDOWS),))
+    c.execute('SELECT DISTINCT user_id FROM rep_buckets')
+    user_ids = set(old_rows) | {row[0] for row in c.fetchall()}
+    for user_id in user_ids:
+        stats = empty_stats(user_id, now)
+        for w in WINDOWS:
+            c.execute(
+                'SELECT COALESCE(SUM(positive), 0), COALESCE(SUM(negative), 0) FROM rep_buckets '
+                'WHERE user_id = ? AND day > ?',
+                (user_id, today - w),
+            )
+            stats[f"pos_{w}"], stats[f"neg_{w}"] = c.fetchone()
+        old = old_rows.get(user_id, {})
+        if old.get("decay_sum") is not None:
+            stats["decay_sum"] = old["decay_sum"]
+        elif old.get("decay_score") is not None and old.get("decay_time") is not None:
+            stats["decay_sum"] = old["decay_score"] * _decay_weight(old["decay_time"])
+        else:
+            c.execute('SELECT day, positive, negative FROM rep_buckets WHERE user_id = ?', (user_id,))
+            stats["decay_sum"] = sum(
+                (positive - negative) * _decay_weight((day + 0.5) * SECONDS_PER_DAY)
+                for day, positive, negative in c.fetchall()
+            )
+        _save(c, stats)
+
+def empty_stats(user_id, now):
+    stats = {"user_id": user_id, "day": int(now // SECONDS_PER_DAY), "decay_sum": 0.0}
+    for w in WINDOWS:
+        stats[f"pos_{w}"] = 0
+        stats[f"neg_{w}"] = 0
+    return stats
+
+def _load(c, user_id):
+    c.execute('SELECT * FROM rep_stats WHERE user_id = ?', (user_id,))
+    row = c.fetchone()
+    if not row:
+        return None
+    return dict(zip([d[0] for d in c.description], row))
+
+def _save(c, stats):
+    columns = list(stats)
+    c.execute(
+        f'INSERT OR REPLACE INTO rep_stats ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})',
+        [stats[col] for col in columns],
+    )
+
+def _advance(c, stats, now):
+    """
+    Moves a user's window totals forward to now's day. Returns True if anything changed.
+    Each daily bucket is subtracted from a window exactly once, when it falls out of it,
+    so the cost is bounded by the buckets that expired rather than the user's history.
+    """
+    today = int(now // SECONDS_PER_DAY)
+    last_day = stats["day"]
+    if last_day >= today:
+        return False
+    for w in WINDOWS:
+        c.execute(
+            'SELECT COALESCE(SUM(positive), 0), COALESCE(SUM(negative), 0) FROM rep_buckets '
+            'WHERE user_id = ? AND day > ? AND day <= ?',
+            (stats["user_id"], last_day - w, today - w),
+        )
+        positive, negative = c.fetchone()
+        stats[f"pos_{w}"] -= positive
+        stats[f"neg_{w}"] -= negative
+    c.execute(
+        'DELETE FROM rep_buckets WHERE user_id = ? AND day <= ?',
+        (stats["user_id"], today - max(WINDOWS)),
+    )
+    stats["day"] = today
+    return True
+
+def _decay_weight(now):
+    return 2 ** ((now - DECAY_EPOCH) / (DECAY_HALF_LIFE_DAYS * SECONDS_PER_DAY))
+
+def decayed_score(decay_sum, now=None):
+    """
+    Converts a stored decay_sum into the time-decayed score as of now.
+    """
+    now = time.time() if now is None else now
+    return decay_sum / _decay_weight(now)
+
+def record_review(c, user_id, amount, now=None):
+    """
+    Counts one positive (amount > 0) or negative review for user_id in today's bucket
+    and in every window total. Call inside the same transaction that updates rep_totals.
+    """
+    now = time.time() if now is None else now
+    stats = _load(c, user_id) or empty_stats(user_id, now)
+    _advance(c, stats, now)
+
+    column = "positive" if amount > 0 else "negative"
+    c.execute(
+        f'INSERT INTO rep_buckets (user_id, day, {column}) VALUES (?, ?, 1) '
+        f'ON CONFLICT(user_id, day) DO UPDATE SET {column} = {column} + 1',
+        (user_id, stats["day"]),
+    )
+    prefix = "pos" if amount > 0 else "neg"
+    for w in WINDOWS:
+        stats[f"{prefix}_{w}"] += 1
+    stats["decay_sum"] += (1 if amount > 0 else -1) * _decay_weight(now)
+    _save(c, stats)
+
+def get_rep_stats(c, user_id, now=None):
+    """
+    Returns the user's rolling stats as of now (all zeros if they have no reviews).
+    Only writes when a day has passed since the user's stats were last advanced.
+    """
+    now = time.time() if now is None else now
+    stats = _load(c, user_id)
+    if stats is None:
+        return empty_stats(user_id, now)
+    if _advance(c, stats, now):
+        _save(c, stats)
+    return stats
+
+def refresh_stale_stats(c, now=None):
+    """
+    Advances the users whose window totals are from an earlier day, so rep_stats can be
+    sorted by a window directly (e.g. for the leaderboard). Each user is rewritten at most once a day.
+    """
+    now = time.time() if now is None else now
+    c.execute('SELECT * FROM rep_stats WHERE day < ?', (int(now // SECONDS_PER_DAY),))
+    columns = [d[0] for d in c.description]
+    for row in c.fetchall():
+        stats = dict(zip(columns, row))
+        _advance(c, stats, now)
+        _save(c, stats)
+
+def metric_value(metric, rep_total, stats):
+    """
+    Returns the value of a metric from METRICS: "total" is the lifetime rep,
+    "7d"/"30d"/"90d" are positive minus negative reviews in that window, "decay" is the decayed score.
+    """
+    if metric == "total":
+        return rep_total
+    if stats is None:
+        return 0
+    if metric == "decay":
+        return decayed_score(stats["decay_sum"])
+    window = int(metric.rstrip("d"))
+    return stats[f"pos_{window}"] - stats[f"neg_{window}"]
+
+def metric_column(metric):
+    """
+    Returns the SQL expression on rep_stats that sorts by a windowed or decay metric.
+    """
+    if metric == "decay":
+        return "decay_sum"
+    window = int(metric.rstrip("d"))
+    return f"(pos_{window} - neg_{window})"
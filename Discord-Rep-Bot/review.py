@@ -7,6 +7,9 @@ import sqlite3
 import re
 from utils import load_config, ensure_ratings_file_exists
 from forum_checker import handle_thread_create, handle_thread_message, NotifiedThreads
+from city_index import CityIndex
+from db_backup import run_snapshot
+from rep_stats import METRICS, WINDOWS, ensure_stats_tables, record_review, get_rep_stats, refresh_stale_stats, decayed_score, metric_column
 from rep_roles import update_rep_role  # <-- Import the role updater
 import asyncio
 import io
@@ -44,6 +47,21 @@ FORUM_CHANNEL_ID = int(config.get('forum_channel_id', 0))
 MISSING_PRICE_TAG_NAME = config.get('missing_price_tag_name', 'Missing Price')
 MISSING_LOCATION_TAG_NAME = config.get('missing_location_tag_name', 'Missing Location')
 LOG_CHANNEL_ID = int(config.get('log_channel_id', 0))
+CITY_MAX_EDIT_DISTANCE = int(config.get('city_max_edit_distance', 1))
+CITY_MIN_FUZZY_LENGTH = int(config.get('city_min_fuzzy_length', 7))
+DB_FILE = config.get('database_file', 'reviews.db')
+BACKUP_DIR = config.get('backup_dir', 'backups')
+BACKUP_INTERVAL_HOURS = float(config.get('backup_interval_hours', 24))
+BACKUP_KEEP = int(config.get('backup_keep', 7))
+BACKUP_BUDGET_SECONDS = float(config.get('backup_budget_seconds', 5))
+
+# Create (or rebuild, if the schema changed) the rolling stats tables once so stats reads and writes don't have to
+with sqlite3.connect(DB_FILE) as stats_conn:
+    ensure_stats_tables(stats_conn.cursor())
+
+# Build the city lookup index once at startup instead of per message
+CITY_INDEX = CityIndex(CITIES, max_distance=CITY_MAX_EDIT_DISTANCE, min_fuzzy_length=CITY_MIN_FUZZY_LENGTH)
+print(f"City index built with {len(CITY_INDEX)} names and aliases.")
 
 intents = discord.Intents.default()
 intents.message_content = True
@@ -65,7 +83,7 @@ async def send_log(message):
 def get_rep(user_id):
     # Dummy implementation, replace with your actual DB logic
     try:
-        with sqlite3.connect("reviews.db") as conn:
+        with sqlite3.connect(DB_FILE) as conn:
             c = conn.cursor()
             c.execute('SELECT rep_total FROM rep_totals WHERE user_id = ?', (user_id,))
             row = c.fetchone()
@@ -74,15 +92,30 @@ def get_rep(user_id):
         print(f"Error fetching rep for {user_id}: {e}")
         return 0
 
-def add_rep(user_id, amount):
+def get_stats(user_id):
     try:
-        with sqlite3.connect("reviews.db") as conn:
+        with sqlite3.connect(DB_FILE) as conn:
+            c = conn.cursor()
+            return get_rep_stats(c, user_id)
+    except Exception as e:
+        print(f"Error fetching rep stats for {user_id}: {e}")
+        return None
+
+def add_rep(user_id, amount, review=False):
+    """
+    Adds amount to the user's rep total. review=True also counts it as a positive/negative
+    review in the rolling window stats (admin adjustments don't).
+    """
+    try:
+        with sqlite3.connect(DB_FILE) as conn:
             c = conn.cursor()
             c.execute('CREATE TABLE IF NOT EXISTS rep_totals (user_id INTEGER PRIMARY KEY, rep_total INTEGER)')
             c.execute('SELECT rep_total FROM rep_totals WHERE user_id = ?', (user_id,))
             row = c.fetchone()
             new_total = (row[0] if row else 0) + amount
             c.execute('INSERT OR REPLACE INTO rep_totals (user_id, rep_total) VALUES (?, ?)', (user_id, new_total))
+            if review:
+                record_review(c, user_id, amount)
             conn.commit()
     except Exception as e:
         print(f"Error adding rep for {user_id}: {e}")
@@ -115,7 +148,7 @@ async def on_thread_create(thread):
             FORUM_CHANNEL_ID,
             MISSING_PRICE_TAG_NAME,
             MISSING_LOCATION_TAG_NAME,
-            CITIES
+            CITY_INDEX
         )
         print("Forum checker handled thread creation.")
     else:
@@ -143,7 +176,7 @@ async def on_message(message):
             FORUM_CHANNEL_ID,
             MISSING_PRICE_TAG_NAME,
             MISSING_LOCATION_TAG_NAME,
-            CITIES,
+            CITY_INDEX,
             notified_threads
         )
     await bot.process_commands(message)
@@ -212,7 +245,7 @@ async def on_message(message):
                 reference=message
             )
             return
-        add_rep(target_user.id, rep_change)
+        add_rep(target_user.id, rep_change, review=True)
         rep = get_rep(target_user.id)
         if rep_change > 0:
             await message.channel.send(
@@ -224,7 +257,7 @@ async def on_message(message):
                 f"{target_user.mention} received **-1 rep** from {message.author.mention}. Total: **{rep}**",
                 reference=message
             )
-        await update_rep_role(target_user)  # Update the rep role
+        await update_rep_role(target_user, rep, get_stats(target_user.id))  # Update the rep role
 
     # Rep correction logic
     if (
@@ -247,7 +280,7 @@ async def on_message(message):
             reply = random.choice(correction_messages).replace("{mention}", message.author.mention)
             await message.channel.send(reply, reference=message)
 
-def _call_update_rep_role_silent(member, rep=None):
+def _call_update_rep_role_silent(member, rep=None, stats=None):
     """
     Call update_rep_role while suppressing stdout/stderr, print(), and most logging
     so it doesn't log every user update. Returns the coroutine (caller should await).
@@ -264,7 +297,7 @@ def _call_update_rep_role_silent(member, rep=None):
             if rep is None:
                 coro = update_rep_role(member)
             else:
-                coro = update_rep_role(member, rep)
+                coro = update_rep_role(member, rep, stats)
             return coro
     finally:
         # restore print and logging threshold
@@ -284,13 +317,44 @@ async def refresh_rep_nicknames():
                 if member.bot:
                     continue
                 rep = get_rep(member.id)
+                stats = get_stats(member.id)
                 # call silently to avoid per-user logging
-                coro = _call_update_rep_role_silent(member, rep)
+                coro = _call_update_rep_role_silent(member, rep, stats)
                 if asyncio.iscoroutine(coro):
                     await coro
         print("Rep nickname refresh completed.")
         await asyncio.sleep(3600)  # Wait 1 hour
 
+def format_snapshot_result(result):
+    lines = [
+        f"Snapshot saved to `{result['path']}` in {result['duration']:.2f}s "
+        f"(max event loop lag {result['max_loop_lag'] * 1000:.0f} ms, {result['restarts']} restarts"
+        f"{', finished in one step' if result['single_step'] else ''})."
+    ]
+    for path in result["exported"]:
+        lines.append(f"Exported `{path}`")
+    return "\n".join(lines)
+
+async def scheduled_snapshots():
+    """
+    Takes an online snapshot of the database every BACKUP_INTERVAL_HOURS while the bot keeps running.
+    """
+    if BACKUP_INTERVAL_HOURS <= 0:
+        print("Scheduled snapshots disabled.")
+        return
+    while True:
+        await asyncio.sleep(BACKUP_INTERVAL_HOURS * 3600)
+        try:
+            result = await run_snapshot(DB_FILE, BACKUP_DIR, keep=BACKUP_KEEP, budget=BACKUP_BUDGET_SECONDS)
+            print(format_snapshot_result(result))
+        except Exception as e:
+            print(f"Scheduled snapshot failed: {e}")
+            await send_log(f"Scheduled database snapshot failed: {e}")
+
+# Background task handles
+nickname_refresh_task = None
+snapshot_task = None
+
 @bot.event
 async def on_ready():
     try:
@@ -309,8 +373,12 @@ async def on_ready():
         #         await update_rep_role(member, rep)
         # print("Rep roles refreshed for all members.")
 
-        # Start periodic refresh task
-        bot.loop.create_task(refresh_rep_nicknames())
+        # Start periodic tasks (on_ready fires again after reconnects, so only start them once)
+        global nickname_refresh_task, snapshot_task
+        if nickname_refresh_task is None or nickname_refresh_task.done():
+            nickname_refresh_task = bot.loop.create_task(refresh_rep_nicknames())
+        if snapshot_task is None or snapshot_task.done():
+            snapshot_task = bot.loop.create_task(scheduled_snapshots())
 
         # Ensure sticky message if configured
         try:
@@ -358,31 +426,86 @@ async def addrep_command(interaction: discord.Interaction, user: discord.Member,
 @bot.tree.command(name="ratings", description="Show a user's total reputation")
 async def ratings_command(interaction: discord.Interaction, user: discord.Member):
     rep = get_rep(user.id)
-    await interaction.response.send_message(f"{user.display_name} has {rep} reputation points.")
+    msg = f"{user.display_name} has {rep} reputation points."
+    stats = get_stats(user.id)
+    if stats:
+        windows = ", ".join(f"{w}d: +{stats[f'pos_{w}']}/-{stats[f'neg_{w}']}" for w in WINDOWS)
+        msg += f"\nRecent reviews — {windows}. Decayed score: {decayed_score(stats['decay_sum']):.1f}"
+    await interaction.response.send_message(msg)
+
+def fetch_leaderboard(metric):
+    """
+    Returns the top 20 (user_id, value) rows for a metric from METRICS.
+    Window metrics only advance users whose totals are from an earlier day; decay sorts on the stored decay_sum.
+    """
+    with sqlite3.connect(DB_FILE) as conn:
+        c = conn.cursor()
+        if metric == "total":
+            c.execute('SELECT user_id, rep_total FROM rep_totals ORDER BY rep_total DESC LIMIT 20')
+            return c.fetchall()
+        if metric != "decay":
+            refresh_stale_stats(c)
+            conn.commit()
+        column = metric_column(metric)
+        c.execute(f'SELECT user_id, {column} FROM rep_stats ORDER BY {column} DESC LIMIT 20')
+        return c.fetchall()
 
 @bot.tree.command(name="leaderboard", description="Show the top 20 users with the most reputation")
-async def leaderboard_command(interaction: discord.Interaction):
+async def leaderboard_command(interaction: discord.Interaction, metric: str = "total"):
     admin_role_id = 1159251626389930045
     if not any(role.id == admin_role_id for role in getattr(interaction.user, "roles", [])):
         await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
         return
+    metric = metric.lower()
+    if metric not in METRICS:
+        await interaction.response.send_message(f"Usage: /leaderboard [{'|'.join(METRICS)}]", ephemeral=True)
+        return
+    # Refreshing stale window totals can touch many rows once a day, so answer within
+    # Discord's 3 second limit first and run the query in a worker thread
+    await interaction.response.defer()
     try:
-        with sqlite3.connect("reviews.db") as conn:
-            c = conn.cursor()
-            c.execute('SELECT user_id, rep_total FROM rep_totals ORDER BY rep_total DESC LIMIT 20')
-            rows = c.fetchall()
+        rows = await asyncio.to_thread(fetch_leaderboard, metric)
         if not rows:
-            await interaction.response.send_message("No reputation data found.")
+            await interaction.followup.send("No reputation data found.")
             return
         leaderboard = []
         for idx, (user_id, rep_total) in enumerate(rows, start=1):
             member = interaction.guild.get_member(user_id)
             name = member.display_name if member else f"User ID: {user_id}"
-            leaderboard.append(f"{idx}. {name} — {rep_total} rep")
-        msg = "**Top 20 Reputation Leaderboard:**\n" + "\n".join(leaderboard)
-        await interaction.response.send_message(msg)
+            if metric == "decay":
+                leaderboard.append(f"{idx}. {name} — {decayed_score(rep_total):.1f}")
+            else:
+                leaderboard.append(f"{idx}. {name} — {rep_total} rep")
+        title = "Top 20 Reputation Leaderboard" if metric == "total" else f"Top 20 Reputation Leaderboard ({metric})"
+        msg = f"**{title}:**\n" + "\n".join(leaderboard)
+        await interaction.followup.send(msg)
+    except Exception as e:
+        await interaction.followup.send(f"Error fetching leaderboard: {e}")
+
+@bot.tree.command(name="snapshot", description="Admin: Back up the reputation database without stopping the bot")
+async def snapshot_command(interaction: discord.Interaction, export: str = "none"):
+    admin_role_id = 1159251626389930045
+    if not any(role.id == admin_role_id for role in getattr(interaction.user, "roles", [])):
+        await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
+        return
+    export = export.lower()
+    if export not in ("none", "jsonl", "csv"):
+        await interaction.response.send_message("Usage: /snapshot [none|jsonl|csv]", ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True)
+    try:
+        result = await run_snapshot(
+            DB_FILE,
+            BACKUP_DIR,
+            keep=BACKUP_KEEP,
+            budget=BACKUP_BUDGET_SECONDS,
+            export_format=None if export == "none" else export,
+        )
+        msg = format_snapshot_result(result)
+        print(msg)
+        await interaction.followup.send(msg, ephemeral=True)
     except Exception as e:
-        await interaction.response.send_message(f"Error fetching leaderboard: {e}", ephemeral=True)
+        await interaction.followup.send(f"Snapshot failed: {e}", ephemeral=True)
 
 print("Starting bot...")
 bot.run(config['bot_token'])
\ No newline at end of file
@@ -0,0 +1,71 @@
+from city_index import CityIndex, TrigramIndex, levenshtein
+
+CITIES = [
+    "San Francisco = SF, San Fran, Frisco",
+    "Sacramento = Sac, Sacto",
+    "Walnut Creek",
+    "Tracy",
+    "Davis",
+    "Chico",
+]
+
+def test_levenshtein():
+    assert levenshtein("davis", "davis") == 0
+    assert levenshtein("davis", "david") == 1
+    assert levenshtein("stockton", "stocton") == 1
+    assert levenshtein("veiw", "view") == 2
+    assert levenshtein("", "abc") == 3
+
+def test_levenshtein_limit_stops_early():
+    assert levenshtein("sacramento", "oakland", limit=1) == 2
+    assert levenshtein("abc", "abcdef", limit=2) == 3
+
+def test_exact_names_and_aliases():
+    index = CityIndex(CITIES, max_distance=0)
+    assert index.find("Couch in San Francisco $50") == "San Francisco"
+    assert index.find("pickup SF only") == "San Francisco"
+    assert index.find("san fran meetup") == "San Francisco"
+    assert index.find("WTS bike, sac area") == "Sacramento"
+    assert index.find("Selling couch $200") is None
+
+def test_aliases_are_exact_only():
+    index = CityIndex(CITIES, max_distance=2, min_fuzzy_length=3)
+    assert index.find("sacti") is None
+
+def test_fuzzy_match_on_long_names():
+    index = CityIndex(CITIES)
+    assert index.find("sacremento local") == "Sacramento"
+    assert index.find("walnut crek trade") == "Walnut Creek"
+
+def test_short_words_need_exact_match():
+    index = CityIndex(CITIES)
+    for text in ["track bike", "sold to david", "chica earrings"]:
+        assert index.find(text) is None
+    assert index.find("Tracy dirt bike") == "Tracy"
+
+def test_fuzzy_match_needs_same_first_letter():
+    index = CityIndex(CITIES)
+    assert index.find("wacramento") is None
+
+def test_max_distance_zero_disables_fuzzy():
+    index = CityIndex(CITIES, max_distance=0)
+    assert index.find("sacremento") is None
+
+def test_extra_edits_need_longer_phrases():
+    index = CityIndex(CITIES, max_distance=2, min_fuzzy_length=7)
+    assert index.allowed_distance("sacrament") == 1
+    assert index.allowed_distance("sacramento") == 2
+    assert index.find("sacremeto") is None
+    assert index.find("sacremenro") == "Sacramento"
+
+def test_trigram_search_on_short_queries():
+    index = TrigramIndex()
+    index.add("trace")
+    # too short for the trigram count filter, so every word is checked
+    assert index.search("trxcx", 2) == (2, "trace")
+    assert index.search("trxcx", 1) is None
+
+def test_min_fuzzy_length_is_clamped():
+    index = CityIndex(CITIES, max_distance=1, min_fuzzy_length=1)
+    assert index.min_fuzzy_length == 3
+    assert index.allowed_distance("ab") == 0
@@ -0,0 +1,126 @@
+import asyncio
+import csv
+import gzip
+import json
+import os
+import sqlite3
+
+import pytest
+
+from db_backup import export_database, prune_snapshots, run_snapshot, snapshot_database
+
+ROWS = [(1, 5), (2, -1), (3, 20)]
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "reviews.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE rep_totals (user_id INTEGER PRIMARY KEY, rep_total INTEGER)')
+        conn.executemany('INSERT INTO rep_totals VALUES (?, ?)', ROWS)
+    conn.close()
+    return str(path)
+
+def read_rows(path):
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute('SELECT user_id, rep_total FROM rep_totals ORDER BY user_id').fetchall()
+    conn.close()
+    return rows
+
+def test_snapshot_copies_database(db_path, tmp_path):
+    result = snapshot_database(db_path, str(tmp_path / "backups"))
+    assert os.path.exists(result["path"])
+    assert read_rows(result["path"]) == ROWS
+    assert result["restarts"] == 0
+    assert not result["single_step"]
+    assert os.listdir(tmp_path / "backups") == [os.path.basename(result["path"])]
+
+def test_snapshot_of_missing_database_raises(tmp_path):
+    missing = tmp_path / "nope.db"
+    backup_dir = tmp_path / "backups"
+    with pytest.raises(sqlite3.OperationalError):
+        snapshot_database(str(missing), str(backup_dir))
+    assert not missing.exists()
+    assert os.listdir(backup_dir) == []
+
+def test_failed_snapshot_leaves_no_tmp_file(db_path, tmp_path, monkeypatch):
+    backup_dir = tmp_path / "backups"
+
+    def failing_backup(self, target, **kwargs):
+        target.execute('CREATE TABLE partial (x)')
+        target.commit()
+        raise sqlite3.OperationalError("disk I/O error")
+
+    real_connect = sqlite3.connect
+
+    class FailingConnection(sqlite3.Connection):
+        backup = failing_backup
+
+    def connect(path, *args, **kwargs):
+        if str(path).startswith("file:"):
+            return real_connect(path, *args, factory=FailingConnection, **kwargs)
+        return real_connect(path, *args, **kwargs)
+
+    monkeypatch.setattr(sqlite3, "connect", connect)
+    with pytest.raises(sqlite3.OperationalError):
+        snapshot_database(db_path, str(backup_dir))
+    assert os.listdir(backup_dir) == []
+
+def test_snapshot_falls_back_to_one_step_after_budget(db_path, tmp_path):
+    result = snapshot_database(db_path, str(tmp_path / "backups"), pages=1, budget=0)
+    assert result["single_step"]
+    assert read_rows(result["path"]) == ROWS
+
+def test_overlapping_run_snapshot_calls_make_separate_snapshots(db_path, tmp_path):
+    backup_dir = str(tmp_path / "backups")
+
+    async def run_two():
+        return await asyncio.gather(
+            run_snapshot(db_path, backup_dir, export_format="csv"),
+            run_snapshot(db_path, backup_dir, export_format="csv"),
+        )
+
+    first, second = asyncio.run(run_two())
+    assert first["path"] != second["path"]
+    for result in (first, second):
+        assert read_rows(result["path"]) == ROWS
+        assert all(os.path.exists(path) for path in result["exported"])
+        assert result["max_loop_lag"] >= 0
+
+def test_prune_keeps_newest_snapshots_and_their_exports(tmp_path):
+    names = [f"reviews-20260101-00000{i}-000000" for i in range(4)]
+    for name in names:
+        for suffix in (".db", ".jsonl.gz", "-rep_totals.csv"):
+            (tmp_path / f"{name}{suffix}").write_text("")
+    in_progress = tmp_path / "reviews-20260101-000009-000000.db.tmp"
+    in_progress.write_text("")
+
+    prune_snapshots(str(tmp_path), keep=2)
+
+    remaining = sorted(os.listdir(tmp_path))
+    expected = sorted(
+        [f"{name}{suffix}" for name in names[2:] for suffix in (".db", ".jsonl.gz", "-rep_totals.csv")]
+        + [in_progress.name]
+    )
+    assert remaining == expected
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_export_jsonl(db_path, compress):
+    (path,) = export_database(db_path, "jsonl", compress=compress)
+    assert path.endswith(".jsonl.gz" if compress else ".jsonl")
+    opener = gzip.open if compress else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert records == [{"table": "rep_totals", "user_id": u, "rep_total": r} for u, r in ROWS]
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_export_csv(db_path, compress):
+    (path,) = export_database(db_path, "csv", compress=compress)
+    assert path.endswith("-rep_totals.csv.gz" if compress else "-rep_totals.csv")
+    opener = gzip.open if compress else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows == [["user_id", "rep_total"]] + [[str(u), str(r)] for u, r in ROWS]
+
+def test_export_rejects_unknown_format(db_path):
+    with pytest.raises(ValueError):
+        export_database(db_path, "xml")
@@ -0,0 +1,228 @@
+import random
+import sqlite3
+
+import pytest
+
+import rep_stats
+from rep_stats import (
+    DECAY_HALF_LIFE_DAYS,
+    SECONDS_PER_DAY,
+    WINDOWS,
+    decayed_score,
+    ensure_stats_tables,
+    get_rep_stats,
+    metric_column,
+    metric_value,
+    record_review,
+    refresh_stale_stats,
+)
+
+# Noon on some day in 2025, so small offsets stay on the same day
+START = 20200 * SECONDS_PER_DAY + SECONDS_PER_DAY // 2
+
+def at(days):
+    return START + days * SECONDS_PER_DAY
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    ensure_stats_tables(conn.cursor())
+    conn.commit()
+    yield conn
+    conn.close()
+
+def windows(stats):
+    return {w: (stats[f"pos_{w}"], stats[f"neg_{w}"]) for w in WINDOWS}
+
+def bucket_count(c, user_id):
+    c.execute('SELECT COUNT(*) FROM rep_buckets WHERE user_id = ?', (user_id,))
+    return c.fetchone()[0]
+
+def test_unknown_user_has_empty_stats(conn):
+    stats = get_rep_stats(conn.cursor(), 42, now=at(0))
+    assert windows(stats) == {w: (0, 0) for w in WINDOWS}
+    assert stats["decay_sum"] == 0
+
+def test_review_counts_in_every_window(conn):
+    c = conn.cursor()
+    record_review(c, 1, 1, now=at(0))
+    record_review(c, 1, -1, now=at(0) + 60)
+    record_review(c, 1, 1, now=at(0) + 120)
+    assert windows(get_rep_stats(c, 1, now=at(0) + 180)) == {w: (2, 1) for w in WINDOWS}
+
+@pytest.mark.parametrize("days, expected", [
+    (6, {7: (1, 0), 30: (1, 0), 90: (1, 0)}),
+    (7, {7: (0, 0), 30: (1, 0), 90: (1, 0)}),
+    (29, {7: (0, 0), 30: (1, 0), 90: (1, 0)}),
+    (30, {7: (0, 0), 30: (0, 0), 90: (1, 0)}),
+    (89, {7: (0, 0), 30: (0, 0), 90: (1, 0)}),
+    (90, {7: (0, 0), 30: (0, 0), 90: (0, 0)}),
+])
+def test_review_leaves_each_window_at_its_edge(conn, days, expected):
+    c = conn.cursor()
+    record_review(c, 1, 1, now=at(0))
+    assert windows(get_rep_stats(c, 1, now=at(days))) == expected
+
+def test_reads_stepping_day_by_day_match_a_single_jump(conn):
+    c = conn.cursor()
+    for day, amount in [(0, 1), (3, -1), (10, 1), (40, 1)]:
+        record_review(c, 1, amount, now=at(day))
+        record_review(c, 2, amount, now=at(day))
+    for day in range(41, 135):
+        stepped = get_rep_stats(c, 1, now=at(day))
+    jumped = get_rep_stats(c, 2, now=at(134))
+    assert windows(stepped) == windows(jumped)
+    assert windows(jumped) == {7: (0, 0), 30: (0, 0), 90: (0, 0)}
+
+def test_skipped_days_subtract_every_expired_bucket(conn):
+    c = conn.cursor()
+    record_review(c, 1, 1, now=at(0))
+    record_review(c, 1, -1, now=at(20))
+    record_review(c, 1, 1, now=at(25))
+    # one jump crosses the 7 day edge of all three and the 30 day edge of the first
+    assert windows(get_rep_stats(c, 1, now=at(45))) == {7: (0, 0), 30: (1, 1), 90: (2, 1)}
+
+def test_same_day_read_does_not_write(conn):
+    c = conn.cursor()
+    record_review(c, 1, 1, now=at(0))
+    conn.commit()
+    before = conn.total_changes
+    get_rep_stats(c, 1, now=at(0) + 3600)
+    assert conn.total_changes == before
+    assert not conn.in_transaction
+
+def test_read_on_a_later_day_persists_the_advance(conn):
+    c = conn.cursor()
+    record_review(c, 1, 1, now=at(0))
+    conn.commit()
+    get_rep_stats(c, 1, now=at(8))
+    c.execute('SELECT day, pos_7, pos_30 FROM rep_stats WHERE user_id = 1')
+    assert c.fetchone() == (int(at(8) // SECONDS_PER_DAY), 0, 1)
+
+def test_buckets_are_capped_at_largest_window(conn):
+    c = conn.cursor()
+    for day in range(200):
+        record_review(c, 1, 1, now=at(day))
+        assert bucket_count(c, 1) <= max(WINDOWS)
+    assert bucket_count(c, 1) == max(WINDOWS)
+    assert windows(get_rep_stats(c, 1, now=at(199))) == {w: (w, 0) for w in WINDOWS}
+
+def test_old_buckets_are_deleted_on_read(conn):
+    c = conn.cursor()
+    record_review(c, 1, 1, now=at(0))
+    get_rep_stats(c, 1, now=at(90))
+    assert bucket_count(c, 1) == 0
+
+def test_refresh_stale_stats_only_touches_stale_rows(conn):
+    c = conn.cursor()
+    record_review(c, 1, 1, now=at(0))
+    record_review(c, 2, 1, now=at(10))
+    conn.commit()
+
+    before = conn.total_changes
+    refresh_stale_stats(c, now=at(10))
+    assert conn.total_changes - before == 1  # only user 1's row (and no buckets were due)
+
+    c.execute('SELECT user_id, day, pos_7 FROM rep_stats ORDER BY user_id')
+    today = int(at(10) // SECONDS_PER_DAY)
+    assert c.fetchall() == [(1, today, 0), (2, today, 1)]
+
+    conn.commit()
+    before = conn.total_changes
+    refresh_stale_stats(c, now=at(10) + 60)
+    assert conn.total_changes == before
+
+def test_decayed_score_halves_each_half_life(conn):
+    c = conn.cursor()
+    record_review(c, 1, 1, now=at(0))
+    stats = get_rep_stats(c, 1, now=at(0))
+    assert decayed_score(stats["decay_sum"], now=at(0)) == pytest.approx(1.0)
+    assert decayed_score(stats["decay_sum"], now=at(DECAY_HALF_LIFE_DAYS)) == pytest.approx(0.5)
+    assert decayed_score(stats["decay_sum"], now=at(2 * DECAY_HALF_LIFE_DAYS)) == pytest.approx(0.25)
+
+def test_decay_sum_is_unchanged_by_reads(conn):
+    c = conn.cursor()
+    record_review(c, 1, 1, now=at(0))
+    first = get_rep_stats(c, 1, now=at(0))["decay_sum"]
+    assert get_rep_stats(c, 1, now=at(45))["decay_sum"] == first
+
+def test_decay_sum_sorts_by_decayed_score(conn):
+    c = conn.cursor()
+    # user 1: two old positives, user 2: one recent positive
+    record_review(c, 1, 1, now=at(0))
+    record_review(c, 1, 1, now=at(0) + 60)
+    record_review(c, 2, 1, now=at(60))
+    c.execute(f'SELECT user_id FROM rep_stats ORDER BY {metric_column("decay")} DESC')
+    assert [row[0] for row in c.fetchall()] == [2, 1]
+    one = decayed_score(get_rep_stats(c, 1, now=at(60))["decay_sum"], now=at(60))
+    two = decayed_score(get_rep_stats(c, 2, now=at(60))["decay_sum"], now=at(60))
+    assert two > one
+
+def test_metric_value_and_column(conn):
+    c = conn.cursor()
+    record_review(c, 1, 1, now=at(0))
+    record_review(c, 1, 1, now=at(10))
+    record_review(c, 1, -1, now=at(10))
+    stats = get_rep_stats(c, 1, now=at(10))
+    assert metric_value("total", 17, stats) == 17
+    assert metric_value("7d", 17, stats) == 0
+    assert metric_value("30d", 17, stats) == 1
+    assert metric_value("90d", 17, None) == 0
+    assert metric_column("30d") == "(pos_30 - neg_30)"
+    c.execute(f'SELECT {metric_column("30d")} FROM rep_stats WHERE user_id = 1')
+    assert c.fetchone() == (1,)
+
+def test_matches_brute_force_recount(conn):
+    c = conn.cursor()
+    rng = random.Random(7)
+    events = []
+    now = START
+    for i in range(1500):
+        now += rng.expovariate(1 / (SECONDS_PER_DAY / 4))
+        user_id = rng.randint(1, 4)
+        amount = rng.choice([1, 1, 1, -1])
+        record_review(c, user_id, amount, now=now)
+        events.append((now, user_id, amount))
+        if i % 50:
+            continue
+        today = int(now // SECONDS_PER_DAY)
+        for uid in range(1, 5):
+            stats = get_rep_stats(c, uid, now=now)
+            for w in WINDOWS:
+                recent = [a for t, u, a in events if u == uid and int(t // SECONDS_PER_DAY) > today - w]
+                assert (stats[f"pos_{w}"], stats[f"neg_{w}"]) == (recent.count(1), recent.count(-1))
+            expected = sum(a * 0.5 ** ((now - t) / SECONDS_PER_DAY / DECAY_HALF_LIFE_DAYS)
+                           for t, u, a in events if u == uid)
+            assert decayed_score(stats["decay_sum"], now=now) == pytest.approx(expected)
+
+def test_old_schema_is_rebuilt(capsys):
+    conn = sqlite3.connect(":memory:")
+    c = conn.cursor()
+    today = int(at(0) // SECONDS_PER_DAY)
+    c.execute(
+        'CREATE TABLE rep_stats (user_id INTEGER PRIMARY KEY, day INTEGER, pos_7 INTEGER, neg_7 INTEGER, '
+        'pos_30 INTEGER, neg_30 INTEGER, pos_90 INTEGER, neg_90 INTEGER, decay_score REAL, decay_time REAL)'
+    )
+    c.execute(
+        'CREATE TABLE rep_buckets (user_id INTEGER, day INTEGER, positive INTEGER DEFAULT 0, '
+        'negative INTEGER DEFAULT 0, PRIMARY KEY (user_id, day))'
+    )
+    c.executemany('INSERT INTO rep_buckets VALUES (?, ?, ?, ?)', [
+        (1, today, 2, 0), (1, today - 10, 1, 1), (1, today - 50, 3, 0), (1, today - 100, 5, 5),
+    ])
+    c.execute('INSERT INTO rep_stats VALUES (1, ?, 0, 0, 0, 0, 0, 0, 4.0, ?)', (today, at(-DECAY_HALF_LIFE_DAYS)))
+
+    ensure_stats_tables(c, now=at(0))
+    assert "rebuilding" in capsys.readouterr().out
+
+    c.execute('PRAGMA table_info(rep_stats)')
+    assert [row[1] for row in c.fetchall()] == rep_stats.stats_columns()
+    stats = get_rep_stats(c, 1, now=at(0))
+    assert windows(stats) == {7: (2, 0), 30: (3, 1), 90: (6, 1)}
+    assert decayed_score(stats["decay_sum"], now=at(0)) == pytest.approx(2.0)
+    assert bucket_count(c, 1) == 3
+
+    # new ratings work against the rebuilt table
+    record_review(c, 1, 1, now=at(0))
+    assert get_rep_stats(c, 1, now=at(0))["pos_7"] == 3
+    conn.close()